@@ -0,0 +1,68 @@
+"""
+Disparo de campanha (worker.py) contra um stub local da Graph com latência.
+
+  antes:  um contato por vez (enviar_pagina sem executor): o teto é 1/latência
+  depois: enviar_pagina com ENVIO_EM_VOO requisições em voo; o balde do
+          graph_client segura o ritmo no alvo por phone_id
+
+Confere que as duas versões geram as mesmas linhas de marcar_status_batch
+(ids, status e message_id capturado) e relata msg/s alcançadas x alvo.
+Não usa banco.
+
+  python bench/campaign_dispatch.py [--contatos 400] [--latencia-ms 300] [--rps 20] [--em-voo 16]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from graph_stub import GraphStub
+
+TEMPLATE = {"name": "cobranca_v2", "language": "pt_BR", "bodyVars": 2, "mapping": {"body": [0, 1]}}
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--contatos", type=int, default=400)
+    p.add_argument("--latencia-ms", type=float, default=300)
+    p.add_argument("--rps", type=float, default=20, help="alvo por phone_id (GRAPH_RPS_POR_PHONE)")
+    p.add_argument("--em-voo", type=int, default=16)
+    args = p.parse_args(argv)
+
+    stub = GraphStub(latencia_ms=args.latencia_ms).iniciar()
+    os.environ["GRAPH_BASE_URL"] = stub.url
+    os.environ["GRAPH_RPS_POR_PHONE"] = str(args.rps)
+    os.environ["INTERVALO_MSG"] = "0"
+    import worker
+
+    contatos = [{"id": i, "telefone": f"55119{i:08d}", "conteudo": f"Cliente {i},R$ {i}.00"}
+                for i in range(args.contatos)]
+
+    def rodar(executor, phone_id):
+        t0 = time.monotonic()
+        updates = worker.enviar_pagina(TEMPLATE, contatos, "token", phone_id, executor)
+        return updates, time.monotonic() - t0
+
+    # phone_ids diferentes: cada rodada começa com o balde cheio
+    antes, t_antes = rodar(None, "100000000000001")
+    with ThreadPoolExecutor(args.em_voo) as ex:
+        depois, t_depois = rodar(ex, "100000000000002")
+
+    assert [(i, st) for i, st, _ in antes] == [(c["id"], "enviado") for c in contatos]
+    assert [(i, st) for i, st, _ in depois] == [(i, st) for i, st, _ in antes]
+    assert all(d.get("message_id", "").startswith("wamid.") for _, _, d in antes + depois)
+
+    n = len(contatos)
+    print(f"{n} contatos, latência {args.latencia_ms:g} ms, alvo {args.rps:g} msg/s por phone_id")
+    print(f"antes  (1 em voo):  {n / t_antes:6.1f} msg/s em {t_antes:.1f}s")
+    print(f"depois ({args.em_voo} em voo): {n / t_depois:6.1f} msg/s em {t_depois:.1f}s "
+          f"({100 * n / t_depois / args.rps:.0f}% do alvo) | {t_antes / t_depois:.1f}x")
+    stub.parar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Custo por mensagem de obter o Flow em handle_incoming.
+
+  antes:  yaml.safe_load + Flow(spec) a cada mensagem (o que handle_incoming fazia)
+  depois: flows.get(path) -> stat() + dict lookup no flow já compilado
+
+  python bench/flow_load.py [--flow flows/onboarding.yaml] [--n 5000] [--nos-sinteticos 200]
+
+--nos-sinteticos gera também um flow maior (cadeia de perguntas/escolhas)
+para mostrar como o custo antigo cresce com o tamanho do YAML.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import yaml
+
+from virtual_agent import Flow, FlowRegistry
+
+
+def _flow_sintetico(n: int) -> str:
+    nos = {}
+    for i in range(n):
+        prox = f"n{i + 1}" if i + 1 < n else "fim"
+        if i % 3 == 0:
+            nos[f"n{i}"] = {"type": "message", "text": f"Passo {i}: {{{{contact.nome}}}}", "next": prox}
+        elif i % 3 == 1:
+            nos[f"n{i}"] = {"type": "question", "text": f"Pergunta {i}?", "save_as": f"r{i}", "next": prox}
+        else:
+            nos[f"n{i}"] = {"type": "choice", "text": "Escolha", "options": [
+                {"label": "Sim", "value": "sim", "next": prox},
+                {"label": "Não", "value": "nao", "next": "fim"}]}
+    nos["fim"] = {"type": "end"}
+    f = tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False, encoding="utf-8")
+    yaml.safe_dump({"flow_id": f"sintetico_{n}", "start": "n0", "nodes": nos}, f, allow_unicode=True)
+    f.close()
+    return f.name
+
+def _antes(path: str) -> Flow:
+    with open(Flow.resolve_path(path), "r", encoding="utf-8") as f:
+        return Flow(yaml.safe_load(f))
+
+def _medir(fn, path: str, n: int) -> float:
+    fn(path)  # aquece
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(path)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--flow", default="flows/onboarding.yaml")
+    p.add_argument("--n", type=int, default=5000)
+    p.add_argument("--nos-sinteticos", type=int, default=200)
+    args = p.parse_args(argv)
+
+    casos = [args.flow]
+    if args.nos_sinteticos:
+        casos.append(_flow_sintetico(args.nos_sinteticos))
+
+    print(f"{'flow':<40} {'antes µs/msg':>14} {'depois µs/msg':>14} {'ganho':>8}")
+    for path in casos:
+        registro = FlowRegistry()
+        n_antes = max(1, args.n // 10)  # o caminho antigo é lento: amostra menor
+        antes = _medir(_antes, path, n_antes)
+        depois = _medir(registro.get, path, args.n)
+        print(f"{os.path.basename(path):<40} {antes:>14.1f} {depois:>14.2f} {antes / depois:>7.0f}x")
+        print(f"{'':<40} recargas={registro.stats['recargas']} cargas={registro.stats['cargas']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Simulador offline de flows: conversas sintéticas pelo Engine.step sem
+WhatsApp, banco ou webhooks, para medir um flow antes do deploy.
+
+- envios: as mensagens de cada step só são contadas, nada sai do processo;
+- call_webhook: stub em memória (--webhook-resposta, --webhook-falha-pct);
+- delay: relógio virtual; wake_at avança o relógio e a conversa retoma no
+  node_id como o despertador faria, sem esperar de verdade. O mesmo relógio
+  alimenta o business_hours_gate (início espalhado pela semana por padrão);
+- entradas: roteiro fixo (--roteiro, YAML/JSON: lista de textos ou lista de
+  conversas) ou aleatórias a partir do nó que está esperando (valor de
+  opção, termo de intent, texto livre).
+
+Relata steps/s (só o tempo dentro do Engine.step), tempo por tipo de nó,
+mensagens por sessão, memória por sessão (bytes que ela ocupa no
+SessionCache) e onde as conversas terminam.
+
+  python bench/flow_simulator.py [--flow flows/onboarding.yaml] [--sessoes 100000] [--processos 4]
+      [--roteiro roteiro.yaml] [--max-steps 40] [--inicio 2024-06-03T10:00:00-03:00] [--seed 7]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from multiprocessing import Pool
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import yaml
+
+from virtual_agent import Engine, Flow, Session, _SessaoCacheada
+
+VOCAB = ("boleto pagar parcela acordo desconto contrato cartão fatura atraso negociar "
+         "quitar valor vencimento pix conta saldo cobrança atendente ajuda dúvida "
+         "obrigado bom dia boa tarde hoje amanhã nome cpf endereço").split()
+NOMES = ["Maria", "João", "Ana", "José", "Francisca", "Antônio"]
+SAUDACOES = ["oi", "olá", "bom dia", "boa tarde", "quero falar com alguém"]
+# segunda 00:00 em São Paulo: o início aleatório cobre a semana toda
+SEGUNDA = datetime(2024, 6, 3, 3, 0, tzinfo=timezone.utc)
+
+
+class RelogioVirtual:
+    def __init__(self, agora: datetime):
+        self.agora = agora
+
+    def __call__(self) -> datetime:
+        return self.agora
+
+    def avancar(self, ate: datetime) -> None:
+        if ate > self.agora:
+            self.agora = ate
+
+
+class WebhookFalso:
+    """Mesma interface de bot_webhooks.ChamadorWebhook.chamar, sem rede."""
+
+    def __init__(self, rnd: random.Random, resposta: dict, falha_pct: float):
+        self.rnd, self.resposta, self.falha_pct = rnd, resposta, falha_pct
+        self.chamadas = self.falhas = 0
+
+    def chamar(self, method, url, body=None, timeout_ms=None, cache_ttl_s=0):
+        self.chamadas += 1
+        if self.falha_pct and self.rnd.random() * 100 < self.falha_pct:
+            self.falhas += 1
+            raise TimeoutError("call_webhook simulado: sem resposta")
+        return dict(self.resposta)
+
+
+def _termos_de_intent(flow: Flow) -> list:
+    return [t for spec in flow.intents.values() for t in spec.get("any", [])]
+
+def _texto_livre(rnd: random.Random) -> str:
+    return " ".join(rnd.choice(VOCAB) for _ in range(rnd.randint(1, 12)))
+
+def _entrada_aleatoria(node, termos, rnd: random.Random) -> str:
+    if node.type == "choice":
+        x = rnd.random()
+        opcoes = node.data.get("options") or []
+        if opcoes and x < 0.6:
+            return str(rnd.choice(opcoes).get("value", ""))
+        if termos and x < 0.85:
+            return f"{_texto_livre(rnd)} {rnd.choice(termos)}"
+    return _texto_livre(rnd)
+
+def _carregar_roteiro(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        dados = json.load(f) if path.endswith(".json") else yaml.safe_load(f)
+    if not isinstance(dados, list) or not dados:
+        raise ValueError("roteiro deve ser uma lista de textos ou uma lista de conversas")
+    conversas = dados if isinstance(dados[0], list) else [dados]
+    return [[str(t) for t in c] for c in conversas if c]
+
+def _percentis(contagem: Counter) -> dict:
+    n = sum(contagem.values())
+    if not n:
+        return {"media": 0, "p50": 0, "p95": 0, "max": 0}
+    r, acumulado = {}, 0
+    alvos = [("p50", 0.50 * n), ("p95", 0.95 * n)]
+    for valor in sorted(contagem):
+        acumulado += contagem[valor]
+        while alvos and acumulado >= alvos[0][1]:
+            r[alvos.pop(0)[0]] = valor
+    r["media"] = round(sum(v * c for v, c in contagem.items()) / n, 1)
+    r["max"] = max(contagem)
+    return r
+
+
+def _simular(parte: dict) -> dict:
+    """Roda `parte["sessoes"]` conversas e devolve os agregados (vai e volta pelo Pool)."""
+    flow = Flow.load_from_file(parte["flow"])
+    rnd = random.Random(parte["seed"])
+    relogio = RelogioVirtual(SEGUNDA)
+    webhook = WebhookFalso(rnd, parte["webhook_resposta"], parte["webhook_falha_pct"])
+    perfil = {}
+    engine = Engine(flow, adiar_delays=True, webhooks=webhook, relogio=relogio, perfil=perfil)
+    termos = _termos_de_intent(flow)
+    roteiros = parte["roteiros"]
+    inicio = parte["inicio"]
+
+    steps, t_steps = 0, 0.0
+    mensagens, memoria, fins, duracao = Counter(), Counter(), Counter(), Counter()
+    for i in range(parte["sessoes"]):
+        relogio.agora = inicio or SEGUNDA + timedelta(seconds=rnd.randrange(7 * 86400))
+        comeco = relogio.agora
+        s = Session(wa_phone=f"{parte['prefixo']}{i:09d}", flow_id=flow.flow_id, node_id=flow.start,
+                    contact={"nome": rnd.choice(NOMES)} if rnd.random() < 0.7 else {})
+        roteiro = iter(roteiros[i % len(roteiros)]) if roteiros else None
+        texto = next(roteiro, None) if roteiro else rnd.choice(SAUDACOES)
+        n_msgs, fim = 0, "max_steps"
+        for _ in range(parte["max_steps"]):
+            t0 = time.perf_counter()
+            s, out = engine.step(s, texto)
+            t_steps += time.perf_counter() - t0
+            steps += 1
+            n_msgs += len(out)
+            if s.wake_at:
+                relogio.avancar(s.wake_at)   # o despertador retomaria aqui
+                s.wake_at, texto = None, None
+                continue
+            node = flow.nodes.get(s.node_id)
+            if s.assigned == "human":
+                fim = "humano"
+                break
+            if node is None or node.type == "end":
+                fim = "fim"
+                break
+            if node.type not in ("question", "choice"):
+                fim = f"parado em {node.type}"
+                break
+            relogio.avancar(relogio.agora + timedelta(seconds=rnd.uniform(3, parte["pausa_s"])))
+            if roteiro:
+                texto = next(roteiro, None)
+                if texto is None:
+                    fim = "roteiro acabou"
+                    break
+            else:
+                texto = _entrada_aleatoria(node, termos, rnd)
+        mensagens[n_msgs] += 1
+        memoria[_SessaoCacheada(s).bytes] += 1
+        fins[f"{fim}:{s.node_id}"] += 1
+        duracao[int((relogio.agora - comeco).total_seconds() // 60)] += 1
+
+    return {"steps": steps, "t_steps": t_steps, "perfil": perfil, "mensagens": mensagens,
+            "memoria": memoria, "fins": fins, "duracao_min": duracao,
+            "webhook": {"chamadas": webhook.chamadas, "falhas": webhook.falhas}}
+
+def _somar(partes: list) -> dict:
+    total = {"steps": 0, "t_steps": 0.0, "perfil": {}, "mensagens": Counter(), "memoria": Counter(),
+             "fins": Counter(), "duracao_min": Counter(), "webhook": Counter()}
+    for p in partes:
+        total["steps"] += p["steps"]
+        total["t_steps"] += p["t_steps"]
+        for tipo, (visitas, segundos) in p["perfil"].items():
+            v = total["perfil"].setdefault(tipo, [0, 0.0])
+            v[0] += visitas
+            v[1] += segundos
+        for k in ("mensagens", "memoria", "fins", "duracao_min", "webhook"):
+            total[k].update(p[k])
+    return total
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--flow", default="flows/onboarding.yaml")
+    p.add_argument("--sessoes", type=int, default=100000)
+    p.add_argument("--processos", type=int, default=1)
+    p.add_argument("--roteiro", help="YAML/JSON com as entradas (senão, aleatórias)")
+    p.add_argument("--max-steps", type=int, default=40, help="steps por conversa antes de desistir")
+    p.add_argument("--pausa-s", type=float, default=60, help="pausa virtual máxima entre mensagens do cliente")
+    p.add_argument("--inicio", help="instante ISO de todas as conversas (senão, espalhadas pela semana)")
+    p.add_argument("--webhook-resposta", default="{}", help="JSON devolvido pelo call_webhook simulado")
+    p.add_argument("--webhook-falha-pct", type=float, default=0)
+    p.add_argument("--seed", type=int, default=7)
+    args = p.parse_args(argv)
+
+    Flow.load_from_file(args.flow)   # valida antes de subir processos
+    inicio = datetime.fromisoformat(args.inicio) if args.inicio else None
+    if inicio and inicio.tzinfo is None:
+        raise SystemExit("--inicio precisa de fuso (ex.: 2024-06-03T10:00:00-03:00)")
+    processos = max(1, args.processos)
+    partes = [{
+        "flow": args.flow, "seed": args.seed + k, "prefixo": f"5511{k:02d}",
+        "sessoes": args.sessoes // processos + (k < args.sessoes % processos),
+        "roteiros": _carregar_roteiro(args.roteiro) if args.roteiro else None,
+        "max_steps": args.max_steps, "pausa_s": max(3.0, args.pausa_s), "inicio": inicio,
+        "webhook_resposta": json.loads(args.webhook_resposta), "webhook_falha_pct": args.webhook_falha_pct,
+    } for k in range(processos)]
+
+    t0 = time.perf_counter()
+    if processos == 1:
+        total = _somar([_simular(partes[0])])
+    else:
+        with Pool(processos) as pool:
+            total = _somar(pool.map(_simular, partes))
+    parede = time.perf_counter() - t0
+
+    steps, t_steps = total["steps"], total["t_steps"]
+    print(f"{args.sessoes} conversas, {steps} steps em {parede:.1f}s ({processos} processo(s))")
+    print(f"Engine.step: {steps / t_steps:,.0f} steps/s por processo | {t_steps / steps * 1e6:.1f} µs/step"
+          f" | simulação inteira {args.sessoes / parede:,.0f} conversas/s")
+
+    print(f"\n{'tipo de nó':<32} {'visitas':>10} {'µs/visita':>10} {'% tempo':>8}")
+    soma = sum(seg for _, seg in total["perfil"].values()) or 1.0
+    for tipo, (visitas, seg) in sorted(total["perfil"].items(), key=lambda kv: -kv[1][1]):
+        print(f"{tipo:<32} {visitas:>10} {seg / visitas * 1e6:>10.2f} {100 * seg / soma:>7.1f}%")
+
+    m, b, d = _percentis(total["mensagens"]), _percentis(total["memoria"]), _percentis(total["duracao_min"])
+    print(f"\nmensagens por sessão: média {m['media']} | p50 {m['p50']} | p95 {m['p95']} | máx {m['max']}")
+    print(f"memória por sessão (SessionCache): média {b['media']} B | p95 {b['p95']} B | máx {b['max']} B")
+    print(f"duração virtual: p50 {d['p50']} min | p95 {d['p95']} min | máx {d['max']} min")
+    print(f"pico de RSS deste processo: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    if total["webhook"]["chamadas"]:
+        print(f"call_webhook simulado: {total['webhook']['chamadas']} chamadas, {total['webhook']['falhas']} falhas")
+
+    print("\nfim das conversas (motivo:nó):")
+    for fim, n in total["fins"].most_common(10):
+        print(f"  {fim:<40} {n:>8} ({100 * n / args.sessoes:.1f}%)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Stub local da Graph API para os benchmarks: responde a qualquer POST como o
+/messages da Meta, com latência opcional, e conta as chamadas.
+
+  stub = GraphStub(latencia_ms=40).iniciar()
+  os.environ["GRAPH_BASE_URL"] = stub.url     # antes de importar graph_client/server
+"""
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class GraphStub:
+    def __init__(self, latencia_ms: float = 0.0, status: int = 200):
+        self.latencia_ms = latencia_ms
+        self.status = status
+        self.chamadas = 0
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self._srv = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._srv.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def iniciar(self) -> "GraphStub":
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive: mede o cliente, não o handshake
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with stub._lock:
+                    stub.chamadas += 1
+                if stub.latencia_ms:
+                    time.sleep(stub.latencia_ms / 1000.0)
+                corpo = json.dumps({
+                    "messaging_product": "whatsapp",
+                    "messages": [{"id": f"wamid.STUB{next(stub._seq):012d}"}],
+                }).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            do_GET = do_POST
+
+            def log_message(self, *args):
+                pass
+
+        self._srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._srv.daemon_threads = True
+        threading.Thread(target=self._srv.serve_forever, name="graph-stub", daemon=True).start()
+        return self
+
+    def parar(self) -> None:
+        if self._srv:
+            self._srv.shutdown()
@@ -0,0 +1,108 @@
+"""
+detect_intent antigo (lower() dos termos + re.search sem compilar, intent a
+intent, a cada mensagem) x IntentMatcher compilado no load do flow.
+
+Gera algumas centenas de intents sintéticas (termos `any` e algumas `regex`),
+textos longos de cliente (com e sem intent, e com a intent no fim do texto),
+confere que as duas versões escolhem a mesma intent e mede µs/mensagem.
+
+  python bench/intent_match.py [--intents 300] [--termos 4] [--regex-pct 20] [--palavras 200] [--n 300]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from virtual_agent import IntentMatcher
+
+VOCAB = ("boleto pagar parcela acordo desconto juros multa contrato cartão fatura atraso "
+         "negociar quitar valor vencimento segunda via pix transferência banco agência "
+         "conta saldo limite cobrança ligação atendente humano falar ajuda dúvida "
+         "obrigado bom dia boa tarde hoje amanhã semana mês ano nome cpf endereço").split()
+PREFIXOS = "protocolo pedido chamado ticket ocorrência nota processo registro contrato boleto".split()
+
+
+def detect_intent_antigo(text, intents):
+    """Cópia da implementação anterior, como referência."""
+    t = (text or "").lower()
+    for name, spec in intents.items():
+        any_terms = [s.lower() for s in spec.get("any", [])]
+        if any_terms and any(any_term in t for any_term in any_terms):
+            return name
+        regex = spec.get("regex")
+        if regex and re.search(regex, t, flags=re.I):
+            return name
+    return None
+
+def _intents(rnd, n, termos, regex_pct):
+    intents = {}
+    for i in range(n):
+        spec = {"any": [f"{rnd.choice(VOCAB)} {rnd.choice(VOCAB)}{i}" if rnd.random() < 0.7
+                        else f"Cod{i:04d}X" for _ in range(termos)]}
+        if rnd.randrange(100) < regex_pct:
+            a, b = rnd.sample(PREFIXOS, 2)
+            spec["regex"] = rf"\b(?:{a}|{b})\s*n?[ºo]?\s*{i}\d{{3}}\b"
+        intents[f"intent_{i}"] = spec
+    return intents
+
+def _textos(rnd, intents, palavras):
+    nomes = list(intents)
+    textos = []
+    for k in range(60):
+        corpo = " ".join(rnd.choice(VOCAB) for _ in range(palavras))
+        alvo = intents[rnd.choice(nomes)]
+        if k % 3 == 0:
+            textos.append(corpo)                                   # nenhuma intent
+        elif k % 3 == 1 and "regex" in alvo:
+            i = int(re.search(r"\{?(\d+)\\d", alvo["regex"]).group(1))
+            prefixo = re.search(r"\(\?:(\w+)", alvo["regex"]).group(1)
+            textos.append(f"{corpo} {prefixo} nº {i}123")          # só a regex, no fim
+        else:
+            textos.append(f"{corpo} {rnd.choice(alvo['any']).upper()}")  # termo no fim, caixa alta
+    return textos
+
+def _medir(fn, textos, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        for t in textos:
+            fn(t)
+    return (time.perf_counter() - t0) / (n * len(textos)) * 1e6
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--intents", type=int, default=300)
+    p.add_argument("--termos", type=int, default=4)
+    p.add_argument("--regex-pct", type=int, default=20)
+    p.add_argument("--palavras", type=int, default=200, help="palavras por texto recebido")
+    p.add_argument("--n", type=int, default=300)
+    p.add_argument("--seed", type=int, default=7)
+    args = p.parse_args(argv)
+
+    rnd = random.Random(args.seed)
+    intents = _intents(rnd, args.intents, args.termos, args.regex_pct)
+    textos = _textos(rnd, intents, args.palavras)
+
+    t0 = time.perf_counter()
+    matcher = IntentMatcher(intents)
+    compilar_ms = (time.perf_counter() - t0) * 1000
+
+    achadas = 0
+    for t in textos:
+        esperado = detect_intent_antigo(t, intents)
+        assert matcher.match(t) == esperado, (t[-60:], matcher.match(t), esperado)
+        achadas += esperado is not None
+
+    a = _medir(lambda t: detect_intent_antigo(t, intents), textos, max(1, args.n // 10))
+    c = _medir(matcher.match, textos, args.n)
+    print(f"{args.intents} intents, textos de ~{args.palavras} palavras ({achadas}/{len(textos)} com intent)")
+    print(f"compilação no load: {compilar_ms:.1f} ms")
+    print(f"antes {a:.1f} µs/msg | depois {c:.1f} µs/msg | {a / c:.1f}x")
+
+if __name__ == "__main__":
+    main()
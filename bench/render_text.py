@@ -0,0 +1,94 @@
+"""
+render_text antigo (re.sub + callback a cada chamada) x Template compilado.
+
+Usa os textos do flow (padrão: flows/onboarding.yaml) com contatos com e sem
+nome, confere que as duas versões produzem o mesmo texto e mede µs/render.
+Mede também o corpo de call_webhook: json.dumps -> render -> json.loads
+contra o renderizador estruturado.
+
+  python bench/render_text.py [--flow flows/onboarding.yaml] [--n 20000]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from virtual_agent import Flow, compile_body
+
+
+def render_text_antigo(tpl, ctx):
+    """Cópia da implementação anterior, como referência."""
+    def repl(m):
+        expr = m.group(1).strip()
+        fallback = ""
+        if " or " in expr:
+            left, right = expr.split(" or ", 1)
+            expr = left.strip()
+            mfb = re.match(r'^[\'"](.*?)[\'"]$', right.strip())
+            if mfb:
+                fallback = mfb.group(1)
+        parts = expr.split(".")
+        val = ctx
+        for p in parts:
+            val = val.get(p) if isinstance(val, dict) else None
+            if val is None:
+                break
+        return str(val) if val is not None else fallback
+    return re.sub(r"\{\{([^}]+)\}\}", repl, tpl)
+
+CORPO = {"cpf": "{{ctx.cpf}}", "nome": "{{contact.nome or 'cliente'}}",
+         "origem": "whatsapp", "itens": [{"id": "{{ctx.contrato}}", "qtd": 1}]}
+VARIAVEIS = [
+    {"ctx": {"cpf": "12345678900", "contrato": "C-991"}, "contact": {"nome": "Maria"}},
+    {"ctx": {}, "contact": {}},
+]
+
+def _medir(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--flow", default="flows/onboarding.yaml")
+    p.add_argument("--n", type=int, default=20000)
+    args = p.parse_args(argv)
+
+    flow = Flow.load_from_file(args.flow)
+    nodes = [n for n in flow.nodes.values() if "text" in n.templates]
+    for nd in nodes:
+        for v in VARIAVEIS:
+            assert nd.render("text", v) == render_text_antigo(nd.data["text"], v), nd.id
+
+    def antigo():
+        for v in VARIAVEIS:
+            for nd in nodes:
+                render_text_antigo(nd.data["text"], v)
+
+    def compilado():
+        for v in VARIAVEIS:
+            for nd in nodes:
+                nd.render("text", v)
+
+    renders = len(VARIAVEIS) * len(nodes)
+    a = _medir(antigo, args.n) / renders
+    c = _medir(compilado, args.n) / renders
+    print(f"textos de {flow.flow_id} ({len(nodes)} nós): antes {a:.2f} µs/render | depois {c:.2f} µs/render | {a / c:.1f}x")
+
+    corpo = compile_body(CORPO)
+    for v in VARIAVEIS:
+        # o caminho antigo falharia com aspas nos valores; aqui os dados são comportados
+        assert corpo(v) == json.loads(render_text_antigo(json.dumps(CORPO), v))
+    a = _medir(lambda: [json.loads(render_text_antigo(json.dumps(CORPO), v)) for v in VARIAVEIS], args.n) / 2
+    c = _medir(lambda: [corpo(v) for v in VARIAVEIS], args.n) / 2
+    print(f"corpo call_webhook: antes {a:.2f} µs | depois {c:.2f} µs | {a / c:.1f}x")
+
+if __name__ == "__main__":
+    main()
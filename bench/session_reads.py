@@ -0,0 +1,156 @@
+"""
+Idas ao banco por mensagem para ler e gravar a sessão do bot sob o lock do contato.
+
+  antes:  pg_advisory_xact_lock; hit no SessionCache confere SELECT version;
+          miss lê SELECT * (mesmo de contato sem sessão); grava a sessão
+  depois: o lock já traz a versão (mesma ida ao banco); hit não consulta,
+          contato sem linha não lê nada; grava a sessão
+
+Banco em memória (bot_sessions num dict, com o CAS de versão das gravações
+do SessionCache): mede round trips, não latência. Confere que as duas
+versões terminam com as mesmas sessões.
+
+  python bench/session_reads.py [--contatos 200] [--mensagens 5000] [--cache 5000] [--seed 7]
+"""
+import argparse
+import os
+import random
+import sys
+from contextlib import contextmanager
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import psycopg2.extras
+
+import virtual_agent as va
+
+
+class BancoFalso:
+    def __init__(self):
+        self.linhas = {}      # wa_phone -> dict da linha de bot_sessions
+        self.consultas = 0
+
+    def conexao(self):
+        return _Conexao(self)
+
+    def execute_values(self, cur, sql, argslist, template=None, page_size=100, fetch=False):
+        self.consultas += 1
+        gravadas = []
+        if "bot_sessions" in sql:
+            insert = sql.lstrip().startswith("INSERT")
+            for wa, flow_id, node_id, ctx, contact, assigned, wake_at, version in argslist:
+                atual = self.linhas.get(wa)
+                # o mesmo CAS do SQL: INSERT só sem linha (ou version - 1); UPDATE só com version - 1
+                if (atual is None and insert) or (atual is not None and atual["version"] == version - 1):
+                    self.linhas[wa] = {"wa_phone": wa, "flow_id": flow_id, "node_id": node_id,
+                                       "ctx": va.json.loads(ctx), "contact": va.json.loads(contact),
+                                       "assigned": assigned, "wake_at": wake_at, "version": version}
+                    gravadas.append({"wa_phone": wa, "version": version})
+        return gravadas if fetch else None
+
+
+class _Cursor:
+    def __init__(self, banco):
+        self.banco, self._res = banco, []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.banco.consultas += 1
+        linha = self.banco.linhas.get(params[-1]) if params else None
+        if "pg_advisory_xact_lock" in sql:
+            self._res = [{"versao": linha["version"] if linha else -1}] if "versao" in sql else [{}]
+        elif "SELECT version FROM bot_sessions" in sql:
+            self._res = [{"version": linha["version"]}] if linha else []
+        elif "SELECT * FROM bot_sessions" in sql:
+            self._res = [dict(linha)] if linha else []
+        else:
+            self._res = []
+
+    def fetchone(self):
+        return self._res[0] if self._res else None
+
+    def fetchall(self):
+        return list(self._res)
+
+    def close(self):
+        pass
+
+
+class _Conexao:
+    def __init__(self, banco):
+        self.banco = banco
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return _Cursor(self.banco)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def rodar(roteiro, cache_max: int, antes: bool):
+    banco = BancoFalso()
+    va.get_conn = banco.conexao
+    va.db.connection = contextmanager(lambda: (yield banco.conexao()))
+    psycopg2.extras.execute_values = banco.execute_values
+    va.sessions = va.SessionCache(max_itens=cache_max)
+    faixas = va.FaixasContato(n=0)
+    if antes:
+        faixas.versao_travada = lambda wa_phone: None   # sem a versão junto do lock
+    va.faixas = faixas
+
+    def passo(wa_phone, texto):
+        s = va.Store.get_session(wa_phone) or va.Session(wa_phone=wa_phone, flow_id="f", node_id="inicio")
+        s.node_id = f"n{len(s.ctx)}"
+        s.ctx[f"r{len(s.ctx)}"] = texto
+        va.Store.upsert_session(s, imediato=faixas.travado())
+
+    for wa_phone, texto in roteiro:
+        faixas.executar(wa_phone, passo, wa_phone, texto)
+    return banco, va.sessions.stats
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--contatos", type=int, default=200)
+    p.add_argument("--mensagens", type=int, default=5000)
+    p.add_argument("--cache", type=int, default=5000, help="SESSION_CACHE_MAX")
+    p.add_argument("--seed", type=int, default=7)
+    args = p.parse_args(argv)
+
+    rnd = random.Random(args.seed)
+    contatos = [f"55119{i:08d}" for i in range(args.contatos)]
+    roteiro = [(rnd.choice(contatos), rnd.choice(["oi", "1", "2", "sim", "não"])) for _ in range(args.mensagens)]
+
+    banco_antes, st_antes = rodar(roteiro, args.cache, antes=True)
+    banco_depois, st_depois = rodar(roteiro, args.cache, antes=False)
+    assert banco_antes.linhas == banco_depois.linhas
+    assert st_antes["conflitos"] == st_depois["conflitos"] == 0
+
+    n = len(roteiro)
+    print(f"{n} mensagens, {args.contatos} contatos, cache de {args.cache} sessões")
+    for nome, banco, st in (("antes ", banco_antes, st_antes), ("depois", banco_depois, st_depois)):
+        print(f"{nome}: {banco.consultas / n:.2f} idas ao banco/msg ({banco.consultas} no total), "
+              f"hits {st['hits']}, misses {st['misses']}")
+    print(f"economia: {1 - banco_depois.consultas / banco_antes.consultas:.0%} das idas ao banco")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Chamadas HTTP da ação `call_webhook` dos flows (CRM, consultas de contrato...).
+
+- orçamento de tempo por nó (`timeout_ms`, padrão CALL_WEBHOOK_TIMEOUT_MS):
+  a chamada roda num pool de threads e o bot espera no máximo isso; estourou,
+  segue por on_error_next e a resposta atrasada (se vier) só alimenta o cache;
+- cache opcional por nó (`cache_ttl_s`), chaveado por método + URL + corpo
+  já renderizados; só respostas 2xx entram;
+- disjuntor por host: CALL_WEBHOOK_CB_FALHAS falhas seguidas (erro, timeout ou
+  5xx) abrem o circuito por CALL_WEBHOOK_CB_ABERTO_S; aberto, a chamada falha
+  na hora (CircuitoAberto) sem ir à rede. Depois disso uma chamada de teste
+  decide se fecha ou abre de novo;
+- latência, hits do cache e estado do circuito por host em metricas().
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from graph_client import Histograma
+
+CALL_WEBHOOK_TIMEOUT_MS = float(os.getenv("CALL_WEBHOOK_TIMEOUT_MS", "5000"))
+CALL_WEBHOOK_THREADS    = int(os.getenv("CALL_WEBHOOK_THREADS", "16"))
+CALL_WEBHOOK_CACHE_MAX  = int(os.getenv("CALL_WEBHOOK_CACHE_MAX", "2000"))
+CALL_WEBHOOK_CB_FALHAS  = int(os.getenv("CALL_WEBHOOK_CB_FALHAS", "5"))
+CALL_WEBHOOK_CB_ABERTO_S = float(os.getenv("CALL_WEBHOOK_CB_ABERTO_S", "30"))
+
+
+class CircuitoAberto(Exception):
+    pass
+
+
+class _Host:
+    def __init__(self):
+        self.falhas_seguidas = 0
+        self.aberto_ate = 0.0
+        self.testando = False
+        self.hist = Histograma()
+        self.stats = {"chamadas": 0, "erros": 0, "timeouts": 0, "http_5xx": 0,
+                      "cache_hits": 0, "cache_misses": 0, "curto_circuito": 0, "aberturas": 0}
+
+    @property
+    def estado(self) -> str:
+        if self.aberto_ate == 0.0:
+            return "fechado"
+        return "aberto" if time.monotonic() < self.aberto_ate else "meio_aberto"
+
+
+class ChamadorWebhook:
+    def __init__(self, threads: int = CALL_WEBHOOK_THREADS, cache_max: int = CALL_WEBHOOK_CACHE_MAX):
+        self.threads = threads
+        self.cache_max = cache_max
+        self._lock = threading.Lock()
+        self._pid = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._sessao: Optional[requests.Session] = None
+        self._hosts: Dict[str, _Host] = {}
+        self._cache: "OrderedDict[Tuple[str, str, str], Tuple[float, str]]" = OrderedDict()
+
+    def _garantir(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # após fork as threads e sockets herdados não existem
+                self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix="call-webhook")
+                s = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=16, pool_maxsize=self.threads, max_retries=0)
+                s.mount("https://", adaptador)
+                s.mount("http://", adaptador)
+                self._sessao = s
+                self._pid = os.getpid()
+
+    def _host(self, url: str) -> Tuple[str, _Host]:
+        nome = urlsplit(url).netloc or "?"
+        h = self._hosts.get(nome)
+        if h is None:
+            with self._lock:
+                h = self._hosts.setdefault(nome, _Host())
+        return nome, h
+
+    # ---- disjuntor ----
+    def _liberar(self, h: _Host) -> None:
+        with self._lock:
+            if h.aberto_ate == 0.0:
+                return
+            if time.monotonic() < h.aberto_ate or h.testando:
+                h.stats["curto_circuito"] += 1
+                raise CircuitoAberto("circuito aberto")
+            h.testando = True   # meio aberto: só esta chamada passa
+
+    def _resultado(self, h: _Host, ok: bool, chamada: Optional[dict] = None) -> None:
+        with self._lock:
+            if chamada is not None:
+                if chamada["contada"]:
+                    return   # o bot já desistiu (timeout) e contou a falha: resposta atrasada não fecha o circuito
+                chamada["contada"] = True
+            h.testando = False
+            if ok:
+                h.falhas_seguidas, h.aberto_ate = 0, 0.0
+                return
+            h.falhas_seguidas += 1
+            if h.aberto_ate or h.falhas_seguidas >= CALL_WEBHOOK_CB_FALHAS:
+                h.aberto_ate = time.monotonic() + CALL_WEBHOOK_CB_ABERTO_S
+                h.stats["aberturas"] += 1
+
+    # ---- chamada ----
+    def _executar(self, h: _Host, chamada: dict, chave, method: str, url: str, body: Any,
+                  timeout_s: float, cache_ttl_s: float) -> Dict[str, Any]:
+        t0 = time.monotonic()
+        try:
+            if method == "POST":
+                resp = self._sessao.post(url, json=body, timeout=timeout_s)
+            else:
+                resp = self._sessao.get(url, params=body, timeout=timeout_s)
+            texto = resp.text
+            json_ = "application/json" in resp.headers.get("Content-Type", "")
+        except Exception:
+            with self._lock:
+                h.stats["erros"] += 1
+                h.hist.observar(1000.0 * (time.monotonic() - t0))
+            self._resultado(h, False, chamada)
+            raise
+        with self._lock:
+            h.hist.observar(1000.0 * (time.monotonic() - t0))
+            if resp.status_code >= 500:
+                h.stats["http_5xx"] += 1
+        self._resultado(h, resp.status_code < 500, chamada)
+        payload = json.loads(texto) if json_ else {"text": texto}
+        if cache_ttl_s > 0 and resp.ok:
+            with self._lock:
+                self._cache[chave] = (time.monotonic() + cache_ttl_s, json.dumps(payload))
+                self._cache.move_to_end(chave)
+                while len(self._cache) > self.cache_max:
+                    self._cache.popitem(last=False)
+        return payload
+
+    def chamar(self, method: str, url: str, body: Any = None,
+               timeout_ms: Optional[float] = None, cache_ttl_s: float = 0) -> Dict[str, Any]:
+        """
+        Devolve o corpo da resposta (JSON ou {"text": ...}). Levanta em erro de
+        rede, orçamento estourado ou circuito aberto: o Engine segue por on_error_next.
+        """
+        self._garantir()
+        method = (method or "GET").upper()
+        nome, h = self._host(url)
+        chave = (method, url, json.dumps(body, sort_keys=True, default=str))
+        if cache_ttl_s > 0:
+            with self._lock:
+                hit = self._cache.get(chave)
+                if hit and hit[0] > time.monotonic():
+                    h.stats["cache_hits"] += 1
+                    self._cache.move_to_end(chave)
+                    return json.loads(hit[1])   # cópia: o Engine grava os valores no ctx
+                h.stats["cache_misses"] += 1
+        self._liberar(h)
+        with self._lock:
+            h.stats["chamadas"] += 1
+        orcamento_s = (timeout_ms or CALL_WEBHOOK_TIMEOUT_MS) / 1000.0
+        chamada = {"contada": False}
+        futuro = self._pool.submit(self._executar, h, chamada, chave, method, url, body, orcamento_s, cache_ttl_s)
+        try:
+            return futuro.result(timeout=orcamento_s)
+        except FuturoTimeout:
+            # a thread termina sozinha (timeout do requests); o disjuntor conta a falha já
+            with self._lock:
+                h.stats["timeouts"] += 1
+            self._resultado(h, False, chamada)
+            raise TimeoutError(f"call_webhook {nome}: sem resposta em {orcamento_s:.1f}s")
+
+    def metricas(self) -> Dict[str, Any]:
+        with self._lock:
+            hosts = {}
+            for nome, h in self._hosts.items():
+                s = dict(h.stats)
+                consultas = s["cache_hits"] + s["cache_misses"]
+                s["cache_hit_rate"] = round(s["cache_hits"] / consultas, 3) if consultas else 0.0
+                s["estado"] = h.estado
+                s["latencia"] = h.hist.resumo()
+                hosts[nome] = s
+            return {"hosts": hosts, "cache_itens": len(self._cache)}
+
+
+chamador = ChamadorWebhook()
@@ -0,0 +1,101 @@
+"""
+Cache em memória (por processo) das tabelas de configuração que mudam poucas
+vezes ao dia: bot_accounts, tickets_limit_config e logout_config.
+
+Cada tabela é carregada inteira na primeira consulta e servida da memória.
+É recarregada quando chega um NOTIFY no canal CANAL com o nome da tabela
+(enviado pelos endpoints PUT e pelos triggers criados em server.init_db) ou,
+como rede de segurança, quando o TTL expira.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import db
+
+CANAL = "config_changed"
+CONFIG_TTL_S = float(os.getenv("CONFIG_TTL_S", "300"))
+CONFIG_RETRY_S = float(os.getenv("CONFIG_RETRY_S", "30"))  # após falha de carga
+
+_CONSULTAS = {
+    "bot_accounts": "SELECT phone_id, enabled, flow_file FROM bot_accounts",
+    "tickets_limit_config": "SELECT carteira, limit_per_agent FROM tickets_limit_config",
+    "logout_config": "SELECT * FROM logout_config WHERE id=1",
+}
+
+def _indexar(tabela: str, rows) -> Any:
+    if tabela == "bot_accounts":
+        return {str(r["phone_id"]): dict(r) for r in rows}
+    if tabela == "tickets_limit_config":
+        return {r["carteira"]: int(r["limit_per_agent"] or 0) for r in rows}
+    return dict(rows[0]) if rows else None
+
+
+class ConfigRegistry:
+    def __init__(self, ttl_s: float = CONFIG_TTL_S):
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._dados: Dict[str, Any] = {}
+        self._valido_ate: Dict[str, float] = {}
+        self._ouvindo = False
+        self.stats = {"cargas": 0, "falhas": 0, "invalidacoes": 0}
+
+    def _garantir_listener(self) -> None:
+        if self._ouvindo:
+            return
+        self._ouvindo = True
+        db.listen(CANAL, self._on_notify, ao_conectar=self.invalidar)
+
+    def _on_notify(self, payload: str) -> None:
+        self.invalidar(payload or None)
+
+    def invalidar(self, tabela: Optional[str] = None) -> None:
+        with self._lock:
+            self.stats["invalidacoes"] += 1
+            if tabela:
+                self._valido_ate.pop(tabela, None)
+            else:
+                self._valido_ate.clear()
+
+    def _get(self, tabela: str) -> Any:
+        self._garantir_listener()
+        agora = time.monotonic()
+        if self._valido_ate.get(tabela, 0) > agora:
+            return self._dados.get(tabela)
+        with self._lock:
+            if self._valido_ate.get(tabela, 0) > agora:
+                return self._dados.get(tabela)
+            try:
+                # conexão própria: uma falha aqui não pode abortar a transação da request
+                with db.connection() as conn, conn.cursor() as cur:
+                    cur.execute(_CONSULTAS[tabela])
+                    rows = cur.fetchall()
+                    conn.rollback()
+                self._dados[tabela] = _indexar(tabela, rows)
+                self._valido_ate[tabela] = time.monotonic() + self.ttl_s
+                self.stats["cargas"] += 1
+            except Exception as e:
+                # mantém o último valor conhecido e tenta de novo mais tarde
+                self._valido_ate[tabela] = time.monotonic() + CONFIG_RETRY_S
+                self.stats["falhas"] += 1
+                print(f"❌ config_registry {tabela}:", e)
+            return self._dados.get(tabela)
+
+    # ---- consultas ----
+    def bot_account(self, phone_id: str) -> Optional[Dict[str, Any]]:
+        return (self._get("bot_accounts") or {}).get(str(phone_id))
+
+    def tickets_limit(self, carteira: str) -> int:
+        return (self._get("tickets_limit_config") or {}).get(carteira, 0)
+
+    def logout_config(self) -> Optional[Dict[str, Any]]:
+        return self._get("logout_config")
+
+
+registry = ConfigRegistry()
+
+def notificar(cur, tabela: str) -> None:
+    """Avisa todos os processos (no commit de `cur`) que `tabela` mudou."""
+    db.notify(cur, CANAL, tabela)
+    registry.invalidar(tabela)
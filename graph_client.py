@@ -0,0 +1,274 @@
+"""
+Cliente único da Graph API (WhatsApp Cloud) usado pelo worker (campanhas),
+pelo conversas (envio avulso e mídias) e pelo virtual_agent (bot).
+
+- uma requests.Session por processo (recriada após fork), com pool
+  keep-alive por host: graph.facebook.com e o lookaside das mídias não
+  pagam handshake TLS a cada chamada;
+- versão da Graph, base e timeouts (conexão, leitura) num lugar só;
+- escolha do token por phone_id (pick_token_for_phone);
+- limite de envio por phone_id (balde de fichas por processo; quem divide
+  o número com outros processos informa a parcela em dividir_limite);
+- retentativa opcional em 429/5xx e erro de rede, com backoff e Retry-After;
+- histograma de latência por operação (messages, get, midia) em metricas().
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GRAPH_VERSION  = os.getenv("GRAPH_VERSION", "v24.0")
+GRAPH_BASE_URL = os.getenv("GRAPH_BASE_URL", "https://graph.facebook.com").rstrip("/")  # bench aponta p/ um stub local
+
+GRAPH_CONNECT_TIMEOUT_S = float(os.getenv("GRAPH_CONNECT_TIMEOUT_S", "5"))
+GRAPH_TIMEOUT_S         = float(os.getenv("GRAPH_TIMEOUT_S", "15"))      # leitura
+GRAPH_POOL_MAX          = int(os.getenv("GRAPH_POOL_MAX", "32"))         # conexões keep-alive por host
+# mensagens/s por phone_id (0 = sem limite); o worker já usava RATE_LIMIT_RPS. Vários worker.py no
+# mesmo número dividem esse total (dividir_limite); conversas e bot ficam com o total por processo
+GRAPH_RPS_POR_PHONE     = float(os.getenv("GRAPH_RPS_POR_PHONE", os.getenv("RATE_LIMIT_RPS", "20")))
+GRAPH_RAJADA            = float(os.getenv("GRAPH_RAJADA", "0")) or max(1.0, GRAPH_RPS_POR_PHONE)
+GRAPH_BACKOFF_S         = float(os.getenv("GRAPH_BACKOFF_S", "1.5"))
+_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+# ====== TOKENS E ROTEAMENTO POR PHONE_ID ======
+PRIMARY_TOKEN = os.getenv("META_TOKEN", "")
+SECONDARY_TOKEN = os.getenv("META_TOKEN_2", "")
+
+# Estes phone_ids usam META_TOKEN (PRIMARY_TOKEN).
+PRIMARY_PHONE_IDS = {
+    "864779140046932",
+    "873637622491517",
+    "828473960349364",
+}
+
+def pick_token_for_phone(phone_id: str, explicit_token: Optional[str] = None) -> str:
+    """
+    - Se 'explicit_token' foi enviado no body -> usa ele.
+    - Caso contrário:
+        * phone_id em PRIMARY_PHONE_IDS -> PRIMARY_TOKEN
+        * senão -> SECONDARY_TOKEN
+    """
+    if explicit_token:
+        return explicit_token
+    return PRIMARY_TOKEN if phone_id in PRIMARY_PHONE_IDS else SECONDARY_TOKEN
+
+
+class Histograma:
+    LIMITES_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self):
+        self.contagens = [0] * (len(self.LIMITES_MS) + 1)
+        self.n = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observar(self, ms: float) -> None:
+        i = 0
+        while i < len(self.LIMITES_MS) and ms > self.LIMITES_MS[i]:
+            i += 1
+        self.contagens[i] += 1
+        self.n += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def _percentil(self, p: float):
+        alvo, acumulado = p / 100.0 * self.n, 0
+        for i, c in enumerate(self.contagens):
+            acumulado += c
+            if c and acumulado >= alvo:
+                return self.LIMITES_MS[i] if i < len(self.LIMITES_MS) else round(self.max_ms, 1)
+        return 0
+
+    def resumo(self) -> Dict[str, Any]:
+        faixas = [f"<={l}" for l in self.LIMITES_MS] + [f">{self.LIMITES_MS[-1]}"]
+        return {
+            "n": self.n,
+            "media_ms": round(self.total_ms / self.n, 1) if self.n else 0.0,
+            "max_ms": round(self.max_ms, 1),
+            # limite superior da faixa onde cai o percentil
+            "p50_ms": self._percentil(50), "p95_ms": self._percentil(95), "p99_ms": self._percentil(99),
+            "faixas_ms": {f: c for f, c in zip(faixas, self.contagens) if c},
+        }
+
+
+class _Balde:
+    """Balde de fichas: `taxa` por segundo, acumulando até `capacidade`."""
+
+    def __init__(self, taxa: float, capacidade: float):
+        self.taxa, self.capacidade = taxa, capacidade
+        self.fichas = capacidade
+        self.t = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reservar(self) -> float:
+        """Reserva uma ficha; devolve quantos segundos esperar por ela."""
+        with self.lock:
+            agora = time.monotonic()
+            self.fichas = min(self.capacidade, self.fichas + (agora - self.t) * self.taxa)
+            self.t = agora
+            self.fichas -= 1
+            return -self.fichas / self.taxa if self.fichas < 0 else 0.0
+
+    def ajustar(self, taxa: float, capacidade: float) -> None:
+        with self.lock:
+            agora = time.monotonic()
+            self.fichas = min(capacidade, self.fichas + (agora - self.t) * self.taxa)
+            self.t = agora
+            self.taxa, self.capacidade = taxa, capacidade
+
+
+class GraphClient:
+    def __init__(self, rps_por_phone: float = GRAPH_RPS_POR_PHONE, rajada: float = GRAPH_RAJADA):
+        self.rps_por_phone, self.rajada = rps_por_phone, rajada
+        self._lock = threading.Lock()
+        self._pid = None
+        self._sessao: Optional[requests.Session] = None
+        self._baldes: Dict[str, _Balde] = {}
+        self._parcelas: Dict[str, int] = {}   # phone_id -> processos dividindo o limite
+        self._hist: Dict[str, Histograma] = {}
+        self.stats = {
+            "chamadas": 0, "retentativas": 0, "erros_rede": 0,
+            "http_2xx": 0, "http_4xx": 0, "http_429": 0, "http_5xx": 0,
+            "limitadas": 0, "espera_limite_s": 0.0,
+        }
+
+    def _session(self) -> requests.Session:
+        if self._pid == os.getpid():
+            return self._sessao
+        with self._lock:
+            if self._pid != os.getpid():
+                # após fork os sockets herdados são do processo pai
+                s = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=8, pool_maxsize=GRAPH_POOL_MAX, max_retries=0)
+                s.mount("https://", adaptador)
+                s.mount("http://", adaptador)
+                self._sessao, self._baldes = s, {}
+                self._pid = os.getpid()
+        return self._sessao
+
+    @staticmethod
+    def url(caminho: str) -> str:
+        return f"{GRAPH_BASE_URL}/{GRAPH_VERSION}/{caminho.lstrip('/')}"
+
+    def rps(self, phone_id: str) -> float:
+        """Limite deste processo para o phone_id (o total dividido pela parcela)."""
+        return self.rps_por_phone / self._parcelas.get(phone_id, 1)
+
+    def _balde_para(self, phone_id: str) -> _Balde:
+        n = self._parcelas.get(phone_id, 1)
+        return _Balde(self.rps_por_phone / n, max(1.0, self.rajada / n))
+
+    def dividir_limite(self, phone_id: str, processos: int) -> None:
+        """
+        `processos` enviam pelo phone_id ao mesmo tempo (este incluso): cada
+        um fica com rps_por_phone / processos, e a soma respeita o limite.
+        """
+        processos = max(1, int(processos))
+        with self._lock:
+            if self._parcelas.get(phone_id, 1) == processos:
+                return
+            self._parcelas[phone_id] = processos
+            balde = self._baldes.get(phone_id)
+            if balde is not None:
+                novo = self._balde_para(phone_id)
+                balde.ajustar(novo.taxa, novo.capacidade)
+
+    def aguardar_vez(self, phone_id: str) -> None:
+        if self.rps_por_phone <= 0 or not phone_id:
+            return
+        balde = self._baldes.get(phone_id)
+        if balde is None:
+            with self._lock:
+                balde = self._baldes.setdefault(phone_id, self._balde_para(phone_id))
+        espera = balde.reservar()
+        if espera > 0:
+            with self._lock:
+                self.stats["limitadas"] += 1
+                self.stats["espera_limite_s"] += espera
+            time.sleep(espera)
+
+    def _registrar(self, operacao: str, ms: float, status: int) -> None:
+        with self._lock:
+            self._hist.setdefault(operacao, Histograma()).observar(ms)
+            s = self.stats
+            s["chamadas"] += 1
+            if status == 0:
+                s["erros_rede"] += 1
+            elif status == 429:
+                s["http_429"] += 1
+            elif status >= 500:
+                s["http_5xx"] += 1
+            elif status >= 400:
+                s["http_4xx"] += 1
+            else:
+                s["http_2xx"] += 1
+
+    def request(self, method: str, url: str, operacao: str, token: Optional[str] = None,
+                timeout: Optional[float] = None, tentativas: int = 0, **kwargs) -> requests.Response:
+        """
+        Uma chamada com o pool do processo. `tentativas` > 0 repete em 429/5xx
+        e erro de rede (backoff exponencial, respeitando Retry-After); a última
+        resposta ou exceção volta para o chamador como no requests.
+        """
+        headers = dict(kwargs.pop("headers", None) or {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        sessao = self._session()
+        for tentativa in range(tentativas + 1):
+            t0 = time.monotonic()
+            try:
+                r = sessao.request(method, url, headers=headers,
+                                   timeout=(GRAPH_CONNECT_TIMEOUT_S, timeout or GRAPH_TIMEOUT_S), **kwargs)
+            except requests.RequestException:
+                self._registrar(operacao, 1000.0 * (time.monotonic() - t0), 0)
+                if tentativa >= tentativas:
+                    raise
+                espera = GRAPH_BACKOFF_S * (2 ** tentativa)
+            else:
+                self._registrar(operacao, 1000.0 * (time.monotonic() - t0), r.status_code)
+                if r.status_code not in _RETENTAVEIS or tentativa >= tentativas:
+                    return r
+                try:
+                    espera = float(r.headers.get("Retry-After") or GRAPH_BACKOFF_S * (2 ** tentativa))
+                except ValueError:
+                    espera = GRAPH_BACKOFF_S * (2 ** tentativa)
+                r.close()
+            with self._lock:
+                self.stats["retentativas"] += 1
+            time.sleep(min(espera, 60.0))
+
+    def post_messages(self, phone_id: str, payload: Dict[str, Any], token: Optional[str] = None,
+                      timeout: Optional[float] = None, tentativas: int = 0) -> Tuple[requests.Response, str]:
+        """POST /{phone_id}/messages, dentro do limite do phone_id. Devolve (resposta, token usado)."""
+        tok = pick_token_for_phone(phone_id, token)
+        self.aguardar_vez(phone_id)
+        r = self.request("POST", self.url(f"{phone_id}/messages"), "messages", token=tok,
+                         json=payload, timeout=timeout, tentativas=tentativas)
+        return r, tok
+
+    def get(self, caminho: str, phone_id: str, params: Optional[Dict[str, Any]] = None,
+            token: Optional[str] = None, timeout: Optional[float] = None) -> Tuple[requests.Response, str]:
+        """GET de um objeto da Graph (ex.: id de mídia). Aceita caminho relativo ou URL completa."""
+        tok = pick_token_for_phone(phone_id, token)
+        url = caminho if caminho.startswith("http") else self.url(caminho)
+        return self.request("GET", url, "get", token=tok, params=params, timeout=timeout), tok
+
+    def baixar(self, url: str, token: str, stream: bool = False, timeout: Optional[float] = None) -> requests.Response:
+        """Binário de mídia (URL do lookaside devolvida pela Graph). Com stream, mede até os headers."""
+        return self.request("GET", url, "midia", token=token, stream=stream, timeout=timeout)
+
+    def metricas(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self.stats)
+            s["latencia"] = {op: h.resumo() for op, h in self._hist.items()}
+            s["phones_limitados"] = len(self._baldes)
+            s["parcelas"] = {p: n for p, n in self._parcelas.items() if n > 1}
+        s["espera_limite_s"] = round(s["espera_limite_s"], 3)
+        s["versao"] = GRAPH_VERSION
+        return s
+
+
+cliente = GraphClient()
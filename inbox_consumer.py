@@ -0,0 +1,189 @@
+import os, time, signal
+
+# o consumidor não deve disputar o agendador de logout com os workers web
+os.environ.setdefault("DISABLE_LOGOUT_SCHEDULER", "1")
+# a linha do inbox só é marcada processada depois que os status estão no banco
+os.environ.setdefault("STATUS_LOTE_MS", "0")
+# ... e depois que a resposta do bot terminou: sem faixas, o bot roda dentro de processar_payload
+# (com o lock do contato, como nas faixas); reprocessar a linha não responde de novo (mensagem já gravada)
+os.environ.setdefault("BOT_FAIXAS", "0")
+
+from db import get_conn
+from server import processar_payload, reprocessar_bot, FalhaBot
+
+# Tuning via env
+INBOX_BATCH_SIZE     = int(os.getenv("INBOX_BATCH_SIZE", "100"))
+INBOX_IDLE_SLEEP_S   = float(os.getenv("INBOX_IDLE_SLEEP_S", "0.5"))
+INBOX_MAX_TENTATIVAS = int(os.getenv("INBOX_MAX_TENTATIVAS", "5"))
+INBOX_STATS_EVERY_S  = float(os.getenv("INBOX_STATS_EVERY_S", "30"))
+INBOX_RETENCAO_H     = float(os.getenv("INBOX_RETENCAO_H", "72"))
+
+stop_flag = False
+def handle_sigterm(*_):
+    global stop_flag
+    stop_flag = True
+signal.signal(signal.SIGTERM, handle_sigterm)
+signal.signal(signal.SIGINT, handle_sigterm)
+
+# ---------- CONTADORES ----------
+stats = {
+    "processados": 0,      # payloads concluídos
+    "erros": 0,            # tentativas que falharam
+    "descartados": 0,      # estouraram INBOX_MAX_TENTATIVAS
+    "falhas_bot": 0,       # payload gravado, resposta do bot falhou (refeita só ela)
+    "lag_ultimo_s": 0.0,   # recebido_em -> processado do último lote
+    "lag_max_s": 0.0,
+}
+
+def processar_lote():
+    """
+    Processa até INBOX_BATCH_SIZE linhas pendentes, uma transação por linha:
+    processar_payload grava e faz commit por payload, então a linha é marcada
+    no commit logo em seguida (uma queda repete no máximo um payload, não o
+    lote inteiro). SKIP LOCKED permite vários consumidores em paralelo.
+    Retorna quantas linhas foram processadas.
+    """
+    tentados = []   # linha que falhou volta na próxima chamada, não em seguida
+    while len(tentados) < INBOX_BATCH_SIZE and not stop_flag:
+        lag = processar_um(tentados)
+        if lag is None:
+            break
+        stats["lag_ultimo_s"] = lag
+        stats["lag_max_s"] = max(stats["lag_max_s"], lag)
+    return len(tentados)
+
+def processar_um(tentados):
+    """
+    Reserva, processa e marca uma linha fora de `tentados` (e a acrescenta lá);
+    devolve o lag dela em s (None = nada pendente).
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT id, payload, tentativas, bot_pendentes,
+                   EXTRACT(EPOCH FROM (NOW() - recebido_em)) AS lag_s
+              FROM webhook_inbox
+             WHERE processado_em IS NULL AND id <> ALL(%s::bigint[])
+             ORDER BY id
+             FOR UPDATE SKIP LOCKED
+             LIMIT 1
+        """, (tentados,))
+        r = cur.fetchone()
+        if r is None:
+            conn.rollback()
+            return None
+        tentados.append(r["id"])
+
+        try:
+            # BOT_FAIXAS=0: a resposta do bot roda aqui dentro, antes de a linha ser marcada
+            if r["bot_pendentes"]:
+                # mensagens já gravadas numa tentativa anterior: a reentrega seria deduplicada
+                # e o bot nunca responderia; refaz só o bot delas
+                reprocessar_bot(r["payload"] or {}, r["bot_pendentes"])
+            else:
+                processar_payload(r["payload"] or {})
+            cur.execute("UPDATE webhook_inbox SET processado_em=NOW(), erro=NULL, bot_pendentes=NULL WHERE id=%s",
+                        (r["id"],))
+            stats["processados"] += 1
+        except FalhaBot as e:
+            stats["erros"] += 1
+            stats["falhas_bot"] += 1
+            tentativas = r["tentativas"] + 1
+            desistir = tentativas >= INBOX_MAX_TENTATIVAS
+            # desistindo, a linha fica processada com o erro e os ids sem resposta (inspeção manual)
+            cur.execute("""
+                UPDATE webhook_inbox
+                   SET tentativas=%s, erro=%s, bot_pendentes=%s,
+                       processado_em = CASE WHEN %s THEN NOW() END
+                 WHERE id=%s
+            """, (tentativas, f"bot: {e}"[:1000], e.ids, desistir, r["id"]))
+            if desistir:
+                stats["descartados"] += 1
+            print(f"❌ inbox {r['id']} bot sem resposta para {e.ids} (tentativa {tentativas}):", e)
+        except Exception as e:
+            stats["erros"] += 1
+            tentativas = r["tentativas"] + 1
+            if tentativas >= INBOX_MAX_TENTATIVAS:
+                # desiste: fica registrado com o erro para inspeção manual
+                cur.execute("""
+                    UPDATE webhook_inbox
+                       SET tentativas=%s, erro=%s, processado_em=NOW()
+                     WHERE id=%s
+                """, (tentativas, str(e)[:1000], r["id"]))
+                stats["descartados"] += 1
+            else:
+                cur.execute("UPDATE webhook_inbox SET tentativas=%s, erro=%s WHERE id=%s",
+                            (tentativas, str(e)[:1000], r["id"]))
+            print(f"❌ inbox {r['id']} (tentativa {tentativas}):", e)
+
+        conn.commit()
+        return float(r["lag_s"] or 0)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close(); conn.close()
+
+def pendentes():
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT COUNT(*) AS n,
+                   COALESCE(EXTRACT(EPOCH FROM (NOW() - MIN(recebido_em))), 0) AS mais_antigo_s
+              FROM webhook_inbox
+             WHERE processado_em IS NULL
+        """)
+        return cur.fetchone()
+    finally:
+        cur.close(); conn.close()
+
+def limpar_processados():
+    conn = get_conn(); cur = conn.cursor()
+    try:
+        cur.execute("""
+            DELETE FROM webhook_inbox
+             WHERE processado_em IS NOT NULL
+               AND processado_em < NOW() - make_interval(secs => %s)
+        """, (INBOX_RETENCAO_H * 3600.0,))
+        conn.commit()
+        return cur.rowcount
+    finally:
+        cur.close(); conn.close()
+
+def main():
+    print("🚀 Inbox consumer pronto.")
+    ultimo_stats = time.monotonic()
+    processados_antes = 0
+    while not stop_flag:
+        try:
+            n = processar_lote()
+        except Exception as e:
+            print("❌ Falha ao drenar inbox:", e)
+            n = 0
+            time.sleep(2)
+
+        agora = time.monotonic()
+        if agora - ultimo_stats >= INBOX_STATS_EVERY_S:
+            janela = agora - ultimo_stats
+            vazao = (stats["processados"] - processados_antes) / janela
+            try:
+                p = pendentes()
+                removidos = limpar_processados()
+            except Exception as e:
+                print("❌ Falha ao consultar inbox:", e)
+                p, removidos = {"n": "?", "mais_antigo_s": 0}, 0
+            print(
+                f"📊 inbox: {vazao:.1f} payloads/s | pendentes={p['n']} "
+                f"(mais antigo {float(p['mais_antigo_s']):.1f}s) | lag último lote={stats['lag_ultimo_s']:.2f}s "
+                f"max={stats['lag_max_s']:.2f}s | erros={stats['erros']} descartados={stats['descartados']} "
+                f"| limpos={removidos}"
+            )
+            processados_antes = stats["processados"]
+            ultimo_stats = agora
+
+        if n == 0:
+            time.sleep(INBOX_IDLE_SLEEP_S)
+
+if __name__ == "__main__":
+    main()
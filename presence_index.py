@@ -0,0 +1,128 @@
+"""
+Índice em memória (por processo) dos contatos que estão com atendimento humano,
+usado pelo gate do webhook para decidir se o agente virtual deve responder.
+
+Duas fontes, as mesmas que o webhook consultava no banco a cada mensagem:
+  - conversas_em_andamento com ended_at IS NULL  -> pares (telefone, phone_id)
+  - bot_sessions com assigned = 'human'          -> wa_phone
+
+O índice é aquecido no boot e mantido por NOTIFY no canal CANAL, enviado por
+tickets_claim / tickets_liberar / tickets_concluir (conversas.py) e pelos nós
+de handoff do agente virtual. Enquanto não está aquecido, está vencido
+(PRESENCA_TTL_S) ou o LISTEN caiu, em_atendimento_humano() devolve None e o
+chamador cai no banco.
+"""
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+import db
+
+CANAL = "presenca_humana"
+PRESENCA_TTL_S = float(os.getenv("PRESENCA_TTL_S", "600"))
+
+
+class PresenceIndex:
+    def __init__(self, ttl_s: float = PRESENCA_TTL_S):
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._carga_lock = threading.Lock()  # uma recarga por vez; as demais threads aguardam
+        self._conversas = set()    # {(telefone, phone_id)}
+        self._bot_humano = set()   # {wa_phone}
+        self._valido_ate = 0.0
+        self._ouvindo = False
+        self._durante_carga = None  # eventos que chegam enquanto aquecer() consulta o banco
+        self.stats = {"cargas": 0, "falhas": 0, "eventos": 0, "consultas": 0, "indisponivel": 0}
+
+    def aquecer(self, forcar: bool = True) -> bool:
+        """(Re)carrega o índice inteiro do banco. Retorna False se falhar."""
+        if not self._ouvindo:
+            self._ouvindo = True
+            # na (re)conexão do LISTEN podem ter se perdido NOTIFYs: força recarga
+            db.listen(CANAL, self._on_notify, ao_conectar=self.invalidar)
+        with self._carga_lock:
+            if not forcar and time.monotonic() < self._valido_ate:
+                return True  # outra thread acabou de recarregar
+            return self._carregar()
+
+    def _carregar(self) -> bool:
+        with self._lock:
+            self._durante_carga = []
+        try:
+            with db.connection() as conn, conn.cursor() as cur:
+                cur.execute("""
+                    SELECT telefone, phone_id
+                      FROM conversas_em_andamento
+                     WHERE ended_at IS NULL
+                """)
+                conversas = {(r["telefone"], r["phone_id"]) for r in cur.fetchall()}
+                cur.execute("SELECT wa_phone FROM bot_sessions WHERE assigned = 'human'")
+                bot_humano = {r["wa_phone"] for r in cur.fetchall()}
+                conn.rollback()
+        except Exception as e:
+            with self._lock:
+                self.stats["falhas"] += 1
+                self._durante_carga = None
+            print("❌ presence_index aquecer:", e)
+            return False
+        with self._lock:
+            for ev in self._durante_carga or []:
+                self._aplicar(conversas, bot_humano, ev)
+            self._durante_carga = None
+            self._conversas = conversas
+            self._bot_humano = bot_humano
+            self._valido_ate = time.monotonic() + self.ttl_s
+            self.stats["cargas"] += 1
+        return True
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._valido_ate = 0.0
+
+    @staticmethod
+    def _aplicar(conversas: set, bot_humano: set, ev: dict) -> None:
+        if ev.get("tipo") == "conversa":
+            chave = (ev.get("telefone"), ev.get("phone_id"))
+            if ev.get("ativo"):
+                conversas.add(chave)
+            else:
+                conversas.discard(chave)
+        elif ev.get("tipo") == "bot":
+            if ev.get("assigned") == "human":
+                bot_humano.add(ev.get("wa_phone"))
+            else:
+                bot_humano.discard(ev.get("wa_phone"))
+
+    def _on_notify(self, payload: str) -> None:
+        ev = json.loads(payload or "{}")
+        with self._lock:
+            self.stats["eventos"] += 1
+            self._aplicar(self._conversas, self._bot_humano, ev)
+            if self._durante_carga is not None:
+                self._durante_carga.append(ev)
+
+    def em_atendimento_humano(self, telefone: str, phone_id: str) -> Optional[bool]:
+        """True/False pelo índice; None quando o índice não é confiável (use o banco)."""
+        self.stats["consultas"] += 1
+        if not self._ouvindo:
+            self.aquecer()
+        if not db.listener_conectado() or (time.monotonic() >= self._valido_ate and not self.aquecer(forcar=False)):
+            self.stats["indisponivel"] += 1
+            return None
+        with self._lock:
+            return (telefone, phone_id) in self._conversas or telefone in self._bot_humano
+
+
+indice = PresenceIndex()
+
+def notificar_conversa(cur, telefone: str, phone_id: str, ativo: bool) -> None:
+    """NOTIFY (no commit de `cur`) de início/fim de conversa humana."""
+    db.notify(cur, CANAL, json.dumps(
+        {"tipo": "conversa", "telefone": telefone, "phone_id": phone_id, "ativo": bool(ativo)}
+    ))
+
+def notificar_bot(cur, wa_phone: str, assigned: str) -> None:
+    """NOTIFY (no commit de `cur`) de mudança de `assigned` numa sessão do bot."""
+    db.notify(cur, CANAL, json.dumps({"tipo": "bot", "wa_phone": wa_phone, "assigned": assigned}))
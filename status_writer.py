@@ -0,0 +1,181 @@
+"""
+Gravação em lote, entre requests, dos callbacks de status (sent/delivered/read).
+
+As campanhas do worker.py geram um webhook pequeno por status. Em vez de um
+INSERT + commit por request, processar_payload entrega as linhas a este
+gravador e uma thread por processo grava tudo que chegou a cada
+STATUS_LOTE_MAX linhas ou STATUS_LOTE_MS milissegundos, numa transação só
+(a mesma função salvar_status do caminho síncrono: execute_values em
+status_mensagens + upsert em status_atual).
+
+`ao_gravar(lote)` roda depois do commit de cada lote (o server marca as
+chaves em ids_vistos só quando elas estão mesmo no banco).
+
+A fila é limitada (STATUS_FILA_MAX linhas). Cheia, desligada
+(STATUS_LOTE_MS=0) ou com a thread morta, enfileirar() devolve False e o
+chamador grava na própria transação, como antes.
+
+Lote que falha STATUS_LOTE_TENTATIVAS vezes não é descartado: volta para a
+frente da fila e é tentado de novo com espera crescente. Com o banco fora a
+fila enche, enfileirar() recusa e o webhook falha na gravação síncrona (a
+Meta reentrega). Só o que sobrar na fila quando o processo sai, depois do
+drenar() do atexit, se perde (contado em "perdidas").
+"""
+import atexit
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+import db
+
+STATUS_LOTE_MAX = int(os.getenv("STATUS_LOTE_MAX", "500"))
+STATUS_LOTE_MS  = float(os.getenv("STATUS_LOTE_MS", "50"))
+STATUS_FILA_MAX = int(os.getenv("STATUS_FILA_MAX", "20000"))
+STATUS_LOTE_TENTATIVAS = int(os.getenv("STATUS_LOTE_TENTATIVAS", "3"))
+
+
+class GravadorStatus:
+    def __init__(self, salvar: Callable, max_lote: int = STATUS_LOTE_MAX,
+                 janela_ms: float = STATUS_LOTE_MS, max_pendentes: int = STATUS_FILA_MAX,
+                 ao_gravar: Optional[Callable] = None):
+        self._salvar = salvar          # salvar(cur, linhas), sem commit
+        self._ao_gravar = ao_gravar    # ao_gravar(linhas), depois do commit
+        self.max_lote = max_lote
+        self.janela_s = janela_ms / 1000.0
+        self.max_pendentes = max_pendentes
+        self._cond = threading.Condition()
+        self._fila: List[tuple] = []
+        self._em_voo = 0
+        self._falhas_seguidas = 0
+        self._pid = None
+        self._thread = None
+        self.stats = {
+            "linhas": 0, "lotes": 0, "lote_max": 0,
+            "flush_ms_total": 0.0, "flush_ms_max": 0.0, "flush_ms_ultimo": 0.0,
+            "fallback_sync": 0, "falhas": 0, "reenfileiradas": 0, "perdidas": 0,
+        }
+
+    @property
+    def ativo(self) -> bool:
+        return self.janela_s > 0 and self.max_lote > 0
+
+    def _garantir_thread(self) -> bool:
+        if self._pid == os.getpid():
+            return self._thread.is_alive()
+        with self._cond:
+            if self._pid != os.getpid():
+                self._fila, self._em_voo = [], 0   # após fork a fila herdada é do processo pai
+                self._thread = threading.Thread(target=self._loop, name="status-writer", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+        return True
+
+    def enfileirar(self, linhas: List[tuple]) -> bool:
+        """True se as linhas ficaram com o gravador; False = grave você mesmo."""
+        if not linhas or not self.ativo or not self._garantir_thread():
+            if linhas:
+                self.stats["fallback_sync"] += 1
+            return False
+        with self._cond:
+            if len(self._fila) + len(linhas) > self.max_pendentes:
+                self.stats["fallback_sync"] += 1
+                return False
+            self._fila.extend(linhas)
+            self._cond.notify()
+        return True
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._fila:
+                    self._cond.wait()
+                # a primeira linha abre a janela; fecha ao encher o lote ou ao fim dela
+                limite = time.monotonic() + self.janela_s
+                while len(self._fila) < self.max_lote:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+                lote = self._fila[:self.max_lote]
+                del self._fila[:self.max_lote]
+                self._em_voo = len(lote)
+            ok = False
+            try:
+                ok = self._gravar(lote)
+            finally:
+                with self._cond:
+                    if not ok:
+                        self._fila[:0] = lote   # na frente: a ordem de chegada se mantém
+                        self.stats["reenfileiradas"] += len(lote)
+                        self._falhas_seguidas += 1
+                    else:
+                        self._falhas_seguidas = 0
+                    self._em_voo = 0
+                    self._cond.notify_all()
+            if not ok:
+                time.sleep(min(30.0, 0.5 * 2 ** min(self._falhas_seguidas, 6)))
+
+    def _gravar(self, lote: List[tuple]) -> bool:
+        for tentativa in range(1, STATUS_LOTE_TENTATIVAS + 1):
+            t0 = time.monotonic()
+            try:
+                with db.connection() as conn:
+                    with conn.cursor() as cur:
+                        self._salvar(cur, lote)
+                    conn.commit()
+            except Exception as e:
+                self.stats["falhas"] += 1
+                print(f"❌ status_writer lote de {len(lote)} (tentativa {tentativa}):", e)
+                time.sleep(min(2.0, 0.2 * tentativa))
+                continue
+            ms = 1000.0 * (time.monotonic() - t0)
+            s = self.stats
+            s["linhas"] += len(lote)
+            s["lotes"] += 1
+            s["lote_max"] = max(s["lote_max"], len(lote))
+            s["flush_ms_total"] += ms
+            s["flush_ms_max"] = max(s["flush_ms_max"], ms)
+            s["flush_ms_ultimo"] = ms
+            if self._ao_gravar is not None:
+                try:
+                    self._ao_gravar(lote)
+                except Exception as e:
+                    print("❌ status_writer ao_gravar:", e)
+            return True
+        return False
+
+    def pendentes(self) -> int:
+        with self._cond:
+            return len(self._fila) + self._em_voo
+
+    def drenar(self, timeout_s: float = 10.0) -> bool:
+        """Espera a fila esvaziar (atexit do gunicorn/consumidor, bench)."""
+        if self._pid != os.getpid():
+            return True
+        limite = time.monotonic() + timeout_s
+        with self._cond:
+            while self._fila or self._em_voo:
+                self._cond.notify_all()
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    restantes = len(self._fila) + self._em_voo
+                    self.stats["perdidas"] += restantes
+                    print(f"⚠️ status_writer: {restantes} linha(s) de status sem gravar após {timeout_s:g}s")
+                    return False
+                self._cond.wait(min(restante, 0.1))
+        return True
+
+    def metricas(self) -> dict:
+        s = dict(self.stats)
+        s["lote_medio"] = round(s["linhas"] / s["lotes"], 1) if s["lotes"] else 0.0
+        s["flush_ms_medio"] = round(s["flush_ms_total"] / s["lotes"], 2) if s["lotes"] else 0.0
+        s["pendentes"] = self.pendentes()
+        s["ativo"] = self.ativo
+        return s
+
+
+def criar(salvar: Callable, ao_gravar: Optional[Callable] = None) -> GravadorStatus:
+    gravador = GravadorStatus(salvar, ao_gravar=ao_gravar)
+    atexit.register(gravador.drenar)
+    return gravador
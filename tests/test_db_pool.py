@@ -0,0 +1,64 @@
+"""Pool compartilhado (db._Pool) com conexões falsas: nada de Postgres."""
+import threading
+import time
+
+import psycopg2
+import pytest
+from psycopg2 import extensions
+
+import db
+
+
+class _Info:
+    transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+
+class _ConexaoFalsa:
+    def __init__(self, *args, **kwargs):
+        self.closed = 0
+        self.autocommit = False
+        self.info = _Info()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(psycopg2, "connect", _ConexaoFalsa)
+    return db._Pool(1, 16, 5.0, dsn="falso")
+
+
+def test_checkouts_concorrentes_reutilizam_conexoes(pool):
+    threads, por_thread = 16, 50
+
+    def trabalho():
+        for _ in range(por_thread):
+            conn = pool.checkout()
+            time.sleep(0.001)
+            pool.checkin(conn)
+
+    ts = [threading.Thread(target=trabalho) for _ in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+
+    assert pool.stats["checkouts"] == threads * por_thread
+    assert pool.stats["abertas"] <= pool.maxconn   # no máximo uma por vaga, não uma por checkout
+    assert pool.stats["fechadas"] == 0
+    assert pool.stats["em_uso"] == 0
+    assert len(pool._pool) == pool.stats["abertas"]
+
+
+def test_conexao_fechada_nao_volta_para_o_pool(pool):
+    conn = pool.checkout()
+    conn.close()
+    pool.checkin(conn)
+    assert conn not in pool._pool
+    nova = pool.checkout()
+    assert nova is not conn and not nova.closed
+    pool.checkin(nova)
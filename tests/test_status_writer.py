@@ -0,0 +1,38 @@
+"""GravadorStatus com db.connection falsa: lote que falha volta para a fila, não se perde."""
+import status_writer
+
+
+class _Conexao:
+    def __init__(self, falhas):
+        self.falhas = falhas
+
+    def __enter__(self):
+        if self.falhas:
+            self.falhas.pop()
+            raise RuntimeError("banco fora")
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def commit(self):
+        pass
+
+
+def test_lote_que_falha_e_reenfileirado(monkeypatch):
+    falhas = [1, 1]   # as duas primeiras conexões falham
+    monkeypatch.setattr(status_writer, "STATUS_LOTE_TENTATIVAS", 1)
+    monkeypatch.setattr(status_writer.db, "connection", lambda: _Conexao(falhas))
+    gravadas, marcadas = [], []
+    g = status_writer.GravadorStatus(lambda cur, linhas: gravadas.extend(linhas), janela_ms=5,
+                                     ao_gravar=marcadas.extend)
+
+    linhas = [(0, f"wamid.{i}", None, "sent") for i in range(3)]
+    assert g.enfileirar(linhas)
+    assert g.drenar(15)
+
+    assert gravadas == linhas and marcadas == linhas
+    assert g.stats["reenfileiradas"] == 6 and g.stats["perdidas"] == 0
@@ -0,0 +1,70 @@
+"""processar_lote (worker.py) sem banco nem Graph: as funções de banco são trocadas por falsas."""
+import pytest
+
+import worker
+
+TEMPLATE = {"name": "t", "language": "pt_BR"}
+
+
+@pytest.fixture
+def falsos(monkeypatch):
+    reg = {"liberados": [], "concluir": 0, "marcar": 0, "simples": 0}
+    monkeypatch.setattr(worker, "ENVIO_RETRY_S", 0.0)
+    monkeypatch.setattr(worker, "reservas", worker.Reservas())
+    monkeypatch.setattr(worker.Reservas, "adicionar",
+                        lambda self, ids: self._ids.update(ids))   # sem thread de renovação
+    monkeypatch.setattr(worker, "enviar_pagina",
+                        lambda template, contatos, *a, **k: [(c["id"], "enviado", {}) for c in contatos[:2]])
+
+    def liberar(ids):
+        ids = list(ids)
+        reg["liberados"].extend(ids)
+        worker.reservas.remover(ids)   # como o liberar_reservas de verdade
+    monkeypatch.setattr(worker, "liberar_reservas", liberar)
+
+    def concluir(envio_id):
+        reg["concluir"] += 1
+    monkeypatch.setattr(worker, "concluir_se_acabou", concluir)
+    return reg
+
+
+def _lote(ids):
+    contatos = [{"id": i, "telefone": "5511", "conteudo": ""} for i in ids]
+    worker.reservas.adicionar(ids)
+    worker.processar_lote({"id": 7, "template": TEMPLATE}, contatos)
+
+
+def test_falha_ao_gravar_status_nao_devolve_os_enviados(falsos, monkeypatch):
+    def falha(*_):
+        raise RuntimeError("banco fora")
+    monkeypatch.setattr(worker, "marcar_status_batch", falha)
+    monkeypatch.setattr(worker, "marcar_status_simples", falha)
+
+    _lote([1, 2, 3])
+
+    # só o que não saiu volta para a fila; os enviados seguem reservados (renovados) até gravar
+    assert falsos["liberados"] == [3]
+    assert worker.reservas._ids == {1, 2}
+    assert [u[0] for _, ups in worker.reservas._segurados for u in ups] == [1, 2]
+
+    # o banco volta: a próxima volta da renovação grava e solta
+    gravados = []
+    monkeypatch.setattr(worker, "marcar_status_batch", gravados.extend)
+    worker.reservas.regravar()
+    assert [u[0] for u in gravados] == [1, 2]
+    assert worker.reservas._ids == set() and worker.reservas._segurados == []
+    assert falsos["concluir"] == 2
+
+
+def test_sem_detalhe_quando_o_lote_completo_falha(falsos, monkeypatch):
+    def falha(*_):
+        raise RuntimeError("detalhe inválido")
+    simples = []
+    monkeypatch.setattr(worker, "marcar_status_batch", falha)
+    monkeypatch.setattr(worker, "marcar_status_simples", simples.extend)
+
+    _lote([1, 2, 3])
+
+    assert [u[0] for u in simples] == [1, 2]
+    assert falsos["liberados"] == [3]
+    assert worker.reservas._ids == set() and worker.reservas._segurados == []
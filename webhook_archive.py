@@ -0,0 +1,335 @@
+"""
+Arquivo dos corpos crus do webhook em segmentos JSONL comprimidos.
+
+- webhook() chama `arquivar(corpo)`: só enfileira (nunca bloqueia a request).
+- Uma thread por processo junta os registros em blocos e grava cada bloco como
+  um membro gzip (ou frame zstd) anexado ao segmento atual. Membros
+  concatenados continuam sendo um .gz/.zst válido (zcat/zstdcat leem direto).
+- Ao lado de cada segmento fica um `.idx` (JSONL) com uma linha por bloco:
+  offset, tamanho, intervalo de tempo e os wamid presentes. fetch/replay
+  descomprimem só os blocos que interessam.
+- Cada linha é {"ts", "ids", "body"} com o corpo cru colado como JSON; corpo
+  que não é JSON válido vai em base64 ({"body": null, "body_b64": ...}) e
+  não quebra a leitura do bloco.
+- Best-effort: com a fila cheia o registro é descartado (só contado em
+  stats["descartados"]) e os segmentos ficam no disco local, podados. Não
+  substitui o que está no Postgres (status_mensagens.raw continua sendo
+  gravado; ver STATUS_RAW_SO_ARQUIVO no server).
+- Segmentos giram por tamanho/idade; os mais antigos além de
+  ARCHIVE_MAX_SEGMENTOS são apagados, menos os que ainda podem estar abertos
+  (o mais novo de cada processo vivo: vários workers gravam no mesmo diretório).
+
+CLI:
+  python webhook_archive.py fetch  --id wamid.XXX
+  python webhook_archive.py fetch  --desde 2024-05-01T10:00 --ate 2024-05-01T11:00
+  python webhook_archive.py replay --id wamid.XXX [--url http://localhost:8080/webhook]
+  (sem --url o replay chama server.processar_payload no próprio processo)
+"""
+import atexit
+import base64
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # opcional: sem o pacote, usa gzip
+    zstandard = None
+
+ARCHIVE_ENABLED        = os.getenv("WEBHOOK_ARCHIVE", "1") == "1"
+ARCHIVE_DIR            = os.getenv("ARCHIVE_DIR", "webhook_archive")
+ARCHIVE_COMPRESSAO     = os.getenv("ARCHIVE_COMPRESSAO", "zstd" if zstandard else "gzip")
+ARCHIVE_BLOCO_MAX      = int(os.getenv("ARCHIVE_BLOCO_MAX", "200"))        # registros por bloco
+ARCHIVE_FLUSH_S        = float(os.getenv("ARCHIVE_FLUSH_S", "2"))
+ARCHIVE_SEGMENTO_MB    = float(os.getenv("ARCHIVE_SEGMENTO_MB", "64"))
+ARCHIVE_SEGMENTO_MAX_S = float(os.getenv("ARCHIVE_SEGMENTO_MAX_S", "3600"))
+ARCHIVE_MAX_SEGMENTOS  = int(os.getenv("ARCHIVE_MAX_SEGMENTOS", "500"))
+ARCHIVE_FILA_MAX       = int(os.getenv("ARCHIVE_FILA_MAX", "10000"))
+
+_RE_WAMID = re.compile(rb'"id"\s*:\s*"(wamid\.[^"]+)"')
+_RE_PID = re.compile(r"-(\d+)\.jsonl\.(?:gz|zst)$")
+
+stats = {"enfileirados": 0, "descartados": 0, "gravados": 0, "blocos": 0,
+         "bytes_crus": 0, "bytes_gravados": 0, "segmentos": 0, "erros": 0,
+         "invalidos": 0}
+
+
+def _ext(compressao: str) -> str:
+    return ".jsonl.zst" if compressao == "zstd" else ".jsonl.gz"
+
+def _comprimir(dados: bytes, compressao: str) -> bytes:
+    if compressao == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(dados)
+    return gzip.compress(dados, compresslevel=5)
+
+def _descomprimir(blob: bytes, caminho: str) -> bytes:
+    if caminho.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("segmento zstd requer o pacote 'zstandard'")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+class _Segmento:
+    def __init__(self, diretorio: str, compressao: str):
+        os.makedirs(diretorio, exist_ok=True)
+        nome = f"webhook-{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+        self.caminho = os.path.join(diretorio, nome + _ext(compressao))
+        self.f = open(self.caminho, "ab")
+        self.idx = open(self.caminho + ".idx", "a", encoding="utf-8")
+        self.aberto_em = time.monotonic()
+        self.tamanho = self.f.tell()
+
+    def gravar_bloco(self, blob: bytes, n: int, t0: float, t1: float, ids: List[str]) -> None:
+        off = self.tamanho
+        self.f.write(blob)
+        self.f.flush()
+        self.tamanho += len(blob)
+        # o índice só aponta para bytes já gravados
+        self.idx.write(json.dumps({"off": off, "len": len(blob), "n": n,
+                                   "t0": round(t0, 3), "t1": round(t1, 3), "ids": ids}) + "\n")
+        self.idx.flush()
+
+    def fechar(self) -> None:
+        self.f.close()
+        self.idx.close()
+
+
+class Arquivo:
+    """Fila + thread gravadora (uma por processo)."""
+
+    def __init__(self, diretorio: str = ARCHIVE_DIR, compressao: str = ARCHIVE_COMPRESSAO):
+        if compressao == "zstd" and zstandard is None:
+            compressao = "gzip"
+        self.diretorio = diretorio
+        self.compressao = compressao
+        self._fila = queue.Queue(maxsize=ARCHIVE_FILA_MAX)
+        self._pid = None
+        self._lock = threading.Lock()
+        self._segmento: Optional[_Segmento] = None
+
+    def _garantir_thread(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._fila = queue.Queue(maxsize=ARCHIVE_FILA_MAX)
+                self._segmento = None
+                threading.Thread(target=self._loop, name="webhook-archive", daemon=True).start()
+
+    def arquivar(self, corpo: bytes, recebido_em: Optional[float] = None) -> None:
+        """Enfileira o corpo cru; se a fila estiver cheia, descarta e conta."""
+        if not corpo:
+            return
+        self._garantir_thread()
+        try:
+            self._fila.put_nowait((recebido_em or time.time(), corpo))
+            stats["enfileirados"] += 1
+        except queue.Full:
+            stats["descartados"] += 1
+
+    def _loop(self) -> None:
+        while True:
+            bloco = []
+            try:
+                bloco.append(self._fila.get(timeout=ARCHIVE_FLUSH_S))
+                limite = time.monotonic() + ARCHIVE_FLUSH_S
+                while len(bloco) < ARCHIVE_BLOCO_MAX:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    bloco.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                pass
+            if bloco:
+                self._gravar(bloco)
+                for _ in bloco:
+                    self._fila.task_done()
+            elif self._segmento and time.monotonic() - self._segmento.aberto_em >= ARCHIVE_SEGMENTO_MAX_S:
+                self._girar()
+
+    def _gravar(self, bloco) -> None:
+        linhas, ids = [], []
+        for ts, corpo in bloco:
+            ids_reg = [m.decode() for m in _RE_WAMID.findall(corpo)]
+            ids.extend(ids_reg)
+            try:
+                json.loads(corpo)
+            except ValueError:
+                # colado cru quebraria a linha (e o bloco inteiro no fetch/replay)
+                stats["invalidos"] += 1
+                linhas.append(b'{"ts":%.3f,"ids":%s,"body":null,"body_b64":"%s"}\n'
+                              % (ts, json.dumps(ids_reg).encode(), base64.b64encode(corpo)))
+                continue
+            # quebras de linha fora de strings são só espaço em JSON (dentro de strings vêm escapadas)
+            corpo = corpo.replace(b"\r", b" ").replace(b"\n", b" ")
+            linhas.append(b'{"ts":%.3f,"ids":%s,"body":%s}\n' % (ts, json.dumps(ids_reg).encode(), corpo))
+        cru = b"".join(linhas)
+        try:
+            blob = _comprimir(cru, self.compressao)
+            seg = self._segmento_atual()
+            seg.gravar_bloco(blob, len(bloco), bloco[0][0], bloco[-1][0], ids)
+            stats["gravados"] += len(bloco)
+            stats["blocos"] += 1
+            stats["bytes_crus"] += len(cru)
+            stats["bytes_gravados"] += len(blob)
+        except Exception as e:
+            stats["erros"] += 1
+            print("❌ webhook_archive gravar:", e)
+
+    def _segmento_atual(self) -> _Segmento:
+        seg = self._segmento
+        if seg and (seg.tamanho >= ARCHIVE_SEGMENTO_MB * 1024 * 1024
+                    or time.monotonic() - seg.aberto_em >= ARCHIVE_SEGMENTO_MAX_S):
+            self._girar()
+        if self._segmento is None:
+            self._segmento = _Segmento(self.diretorio, self.compressao)
+            stats["segmentos"] += 1
+            self._podar()
+        return self._segmento
+
+    def _girar(self) -> None:
+        if self._segmento:
+            self._segmento.fechar()
+            self._segmento = None
+
+    def _podar(self) -> None:
+        segs = segmentos(self.diretorio)
+        abertos = _possivelmente_abertos(segs)
+        fechados = [c for c in segs if c not in abertos]
+        for caminho in fechados[:max(0, len(segs) - ARCHIVE_MAX_SEGMENTOS)]:
+            for p in (caminho, caminho + ".idx"):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+
+    def drenar(self, timeout_s: float = 5.0) -> None:
+        """Espera tudo que foi enfileirado chegar ao disco (atexit, CLI, bench)."""
+        if self._pid != os.getpid():
+            return
+        limite = time.monotonic() + timeout_s
+        while self._fila.unfinished_tasks and time.monotonic() < limite:
+            time.sleep(0.05)
+
+
+arquivo = Arquivo()
+atexit.register(arquivo.drenar)
+
+def arquivar(corpo: bytes) -> None:
+    if ARCHIVE_ENABLED:
+        arquivo.arquivar(corpo)
+
+def ativo() -> bool:
+    return ARCHIVE_ENABLED
+
+
+# ---------- leitura (fetch / replay) ----------
+def segmentos(diretorio: str = ARCHIVE_DIR) -> List[str]:
+    try:
+        nomes = os.listdir(diretorio)
+    except FileNotFoundError:
+        return []
+    return sorted(os.path.join(diretorio, n) for n in nomes if n.endswith((".jsonl.gz", ".jsonl.zst")))
+
+def _processo_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass   # existe, de outro usuário
+    return True
+
+def _possivelmente_abertos(segs: List[str]) -> set:
+    """O segmento mais novo de cada processo vivo (cada processo grava num só por vez)."""
+    ultimo = {}
+    for caminho in segs:   # em ordem de nome = ordem de abertura
+        m = _RE_PID.search(caminho)
+        if m:
+            ultimo[int(m.group(1))] = caminho
+    return {c for pid, c in ultimo.items() if pid == os.getpid() or _processo_vivo(pid)}
+
+def _ts(valor: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(valor).timestamp() if valor else None
+
+def buscar(msg_id: Optional[str] = None, desde: Optional[float] = None,
+           ate: Optional[float] = None, diretorio: str = ARCHIVE_DIR) -> Iterator[dict]:
+    """Registros {"ts", "ids", "body"} que contêm msg_id e/ou caem em [desde, ate]."""
+    for caminho in segmentos(diretorio):
+        try:
+            with open(caminho + ".idx", encoding="utf-8") as fidx:
+                blocos = [json.loads(l) for l in fidx if l.strip()]
+        except FileNotFoundError:
+            continue
+        with open(caminho, "rb") as f:
+            for b in blocos:
+                if msg_id and msg_id not in b["ids"]:
+                    continue
+                if desde is not None and b["t1"] < desde:
+                    continue
+                if ate is not None and b["t0"] > ate:
+                    continue
+                f.seek(b["off"])
+                for linha in _descomprimir(f.read(b["len"]), caminho).splitlines():
+                    try:
+                        reg = json.loads(linha)
+                    except ValueError:
+                        # segmentos antigos colavam o corpo sem validar
+                        print(f"⚠️ webhook_archive: linha inválida em {caminho} (bloco em {b['off']}), ignorada")
+                        continue
+                    if msg_id and msg_id not in reg["ids"]:
+                        continue
+                    if (desde is not None and reg["ts"] < desde) or (ate is not None and reg["ts"] > ate):
+                        continue
+                    yield reg
+
+
+def main(argv=None):
+    import argparse
+    p = argparse.ArgumentParser(description="Consulta/reprocessa o arquivo cru do webhook")
+    p.add_argument("acao", choices=["fetch", "replay"])
+    p.add_argument("--id", help="wamid de mensagem ou status")
+    p.add_argument("--desde", help="ISO 8601, ex.: 2024-05-01T10:00")
+    p.add_argument("--ate", help="ISO 8601")
+    p.add_argument("--dir", default=ARCHIVE_DIR)
+    p.add_argument("--url", help="replay: POST para esta URL em vez de processar localmente")
+    args = p.parse_args(argv)
+    if not (args.id or args.desde or args.ate):
+        p.error("informe --id e/ou --desde/--ate")
+
+    regs = buscar(args.id, _ts(args.desde), _ts(args.ate), args.dir)
+    if args.acao == "fetch":
+        for reg in regs:
+            print(json.dumps(reg, ensure_ascii=False))
+        return
+
+    if args.url:
+        import requests
+        sessao = requests.Session()
+        enviar = lambda body: sessao.post(args.url, json=body, timeout=30).raise_for_status()
+    else:
+        os.environ.setdefault("DISABLE_LOGOUT_SCHEDULER", "1")
+        from server import processar_payload
+        enviar = processar_payload
+    n = 0
+    for reg in regs:
+        if reg.get("body") is None:
+            print(f"⚠️ replay {datetime.fromtimestamp(reg['ts']):%Y-%m-%d %H:%M:%S}: corpo não era JSON, ignorado")
+            continue
+        try:
+            enviar(reg["body"])
+            n += 1
+        except Exception as e:
+            print(f"❌ replay {datetime.fromtimestamp(reg['ts']):%Y-%m-%d %H:%M:%S}:", e)
+    print(f"🔁 {n} payload(s) reprocessado(s)")
+
+if __name__ == "__main__":
+    main()